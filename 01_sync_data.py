@@ -1,17 +1,44 @@
 from __future__ import annotations
 
 import json
-import os
 import sqlite3
+from contextlib import closing
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional
 
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# orjson 是 C 實作的解析器，對這種數百 KB 的 payload 快 2-6 倍；
+# 沒安裝時退回內建 json
+try:
+    import orjson
+
+    def _parse_json(data: bytes | bytearray) -> Dict[str, Any]:
+        # orjson 不吃 utf-8-sig，BOM 自己剝掉
+        return orjson.loads(data.lstrip(b"\xef\xbb\xbf"))
+except ImportError:
+    def _parse_json(data: bytes | bytearray) -> Dict[str, Any]:
+        return json.loads(data.decode("utf-8-sig"))
 
 # 關閉 SSL 警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# 共用 Session：重複呼叫時沿用同一條 TCP+TLS 連線，省下握手時間
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=4,
+        max_retries=Retry(total=2, backoff_factor=0.3),
+    ),
+)
+# 只宣告 gzip：br 需要另裝 brotli 套件才解得開
+_SESSION.headers["Accept-Encoding"] = "gzip"
+
 # 1. API 設定
 API_KEY = "CWA-5D2BD77F-1B94-40C6-A752-E8DF4FA8D92F"
 API_URL = "https://opendata.cwa.gov.tw/fileapi/v1/opendataapi/F-A0010-001"
@@ -19,31 +46,47 @@ DB_NAME = "data.db"
 # 設定本地檔案路徑 (如果有下載好的 JSON 可優先讀取)
 LOCAL_JSON_PATH = Path.home() / "Downloads" / "F-A0010-001.json"
 
-def init_db():
-    # 刪除舊檔確保 Schema 更新
-    if os.path.exists(DB_NAME):
-        try:
-            os.remove(DB_NAME)
-            print(f"🗑️ 已刪除舊資料庫 {DB_NAME} (為了更新欄位結構)...")
-        except:
-            pass
-
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    # 2. 建立更詳細的 Schema
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weather (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            location TEXT,
-            forecast_date TEXT, 
-            min_temp REAL,
-            max_temp REAL,
-            description TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+def init_db(fast_refresh: bool = False):
+    # 不再刪除整個 db 檔案：直接在同一條連線內重建 Table，
+    # 避免檔案系統 metadata 操作與重新初始化 WAL 的成本。
+    # sqlite3 的 with 只管交易不關連線，用 closing 確保連線釋放
+    with closing(sqlite3.connect(DB_NAME)) as conn:
+        if fast_refresh:
+            # Schema 未變動時不動資料：清空由 fetch_and_save 在寫入交易內一起做，
+            # 下載失敗時才不會留下空資料庫
+            try:
+                conn.execute("SELECT 1 FROM weather_raw LIMIT 1")
+                print("♻️ 沿用既有 weather_raw 資料表 (fast refresh)。")
+                return
+            except sqlite3.OperationalError:
+                # Table 還不存在，往下走完整重建
+                pass
+
+        # 2. 建立更詳細的 Schema：
+        #    溫度存成「十分之一度」整數 (23.7°C -> 237)，每列省 8 bytes；
+        #    (location, forecast_date) 當主鍵 + WITHOUT ROWID，省掉隱藏 rowid b-tree。
+        #    對外仍透過 weather view 提供 REAL 溫度，讀取端不用改。
+        conn.executescript('''
+            DROP VIEW IF EXISTS weather;
+            DROP TABLE IF EXISTS weather;
+            DROP TABLE IF EXISTS weather_raw;
+            CREATE TABLE weather_raw (
+                location TEXT NOT NULL,
+                forecast_date TEXT NOT NULL,
+                min_temp_dc INTEGER,
+                max_temp_dc INTEGER,
+                description TEXT,
+                PRIMARY KEY (location, forecast_date)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_weather_date_loc
+                ON weather_raw(forecast_date, location);
+            CREATE VIEW weather AS
+                SELECT location, forecast_date,
+                       min_temp_dc / 10.0 AS min_temp,
+                       max_temp_dc / 10.0 AS max_temp,
+                       description
+                FROM weather_raw;
+        ''')
     print("✅ 資料庫 data.db 已建立 (包含日期欄位)。")
 
 
@@ -51,16 +94,19 @@ def _load_payload() -> Dict[str, Any]:
     """優先讀取本地檔案，若無則下載 API"""
     if LOCAL_JSON_PATH.exists():
         print(f"📂 讀取本地檔案: {LOCAL_JSON_PATH}")
-        with LOCAL_JSON_PATH.open("r", encoding="utf-8-sig") as handle: # 加上 utf-8-sig 處理 BOM
-            return json.load(handle)
+        return _parse_json(LOCAL_JSON_PATH.read_bytes())
 
     print("☁️ 本地無檔案，正在連線 CWA API...")
     params = {"Authorization": API_KEY, "downloadType": "WEB", "format": "JSON"}
-    response = requests.get(API_URL, params=params, verify=False, timeout=30)
-    response.raise_for_status()
-    # 強制設定編碼為 utf-8，避免亂碼
-    response.encoding = "utf-8"
-    return response.json()
+    # stream=True + 分塊收進單一 bytearray：邊下載邊解壓，
+    # 避免 requests 先堆一串 chunk 再 join 的額外複製
+    with _SESSION.get(API_URL, params=params, verify=False, timeout=30, stream=True) as response:
+        response.raise_for_status()
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size=1 << 16):
+            buffer += chunk
+    # bytearray 直接丟給解析器，不再複製成 bytes
+    return _parse_json(buffer)
 
 
 def _iter_forecast_locations(payload: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
@@ -122,12 +168,24 @@ def _iter_tide_locations(payload: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
                 yield entry
 
 
+def _temp_to_tenths(value: Any) -> Optional[int]:
+    """溫度轉十分之一度整數；CWA 缺值會放 \"-\" 之類符號，轉不動就回 None"""
+    if value is None:
+        return None
+    try:
+        return int(round(float(value) * 10))
+    except (TypeError, ValueError):
+        return None
+
+
 def _extract_temperature(element: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    # 直接回傳原始 daily list，不另外複製一份；
+    # 非 dict 的項目留給呼叫端在取值時過濾
     if not element:
         return None
     daily = element.get("daily")
     if isinstance(daily, list):
-        return [item for item in daily if isinstance(item, dict)]
+        return daily
     return None
 
 
@@ -141,60 +199,57 @@ def fetch_and_save():
 
     # 使用 context manager 自動關閉連線
     with sqlite3.connect(DB_NAME) as conn:
+        # 調整 PRAGMA：WAL + 關閉同步，批次寫入只需一次 fsync
+        conn.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=OFF;"
+            "PRAGMA temp_store=MEMORY;"
+            "PRAGMA cache_size=-65536;"
+        )
         cursor = conn.cursor()
-        insert_count = 0
+        rows: List[tuple] = []
 
-        # 嘗試解析農業氣象
+        # 嘗試解析農業氣象 (直接消費 generator，不先 list() 整包實體化)
         print("🔍 嘗試解析農業氣象結構...")
-        forecasts = list(_iter_forecast_locations(payload))
-        
-        if forecasts:
-            print(f"✅ 偵測到農業氣象資料 (共 {len(forecasts)} 個地區)，開始寫入...")
-            for entry in forecasts:
-                loc_name = entry.get("locationName")
-                elements = entry.get("weatherElements", {})
-                
-                min_series = _extract_temperature(elements.get("MinT"))
-                max_series = _extract_temperature(elements.get("MaxT"))
-                weather_series = _extract_temperature(elements.get("Wx"))
-
-                # 確保三個序列都存在
-                if not (min_series and max_series and weather_series):
-                    print(f"⚠️ 跳過 {loc_name}: 資料不完整")
-                    continue
-
-                # 取三者最小長度，避免 index out of range
-                limit = min(len(min_series), len(max_series), len(weather_series))
-                
-                for idx in range(limit):
-                    min_item = min_series[idx]
-                    max_item = max_series[idx]
-                    wx_item = weather_series[idx]
-
-                    date_str = min_item.get("dataDate") or max_item.get("dataDate")
-                    min_temp = min_item.get("temperature")
-                    max_temp = max_item.get("temperature")
-                    description = wx_item.get("weather")
-
-                    try:
-                        cursor.execute(
-                            """
-                            INSERT INTO weather (location, forecast_date, min_temp, max_temp, description)
-                            VALUES (?, ?, ?, ?, ?)
-                            """,
-                            (
-                                loc_name,
-                                date_str,
-                                float(min_temp) if min_temp is not None else None,
-                                float(max_temp) if max_temp is not None else None,
-                                description,
-                            ),
-                        )
-                        insert_count += 1
-                    except Exception as exc:
-                        print(f"⚠️ 寫入 {loc_name} {date_str} 失敗：{exc}")
-
-        else:
+        found_agri = False
+        # 地名每列重複出現，用 cache 共用同一個 str 物件，減少配置與後續 groupby 比對成本
+        loc_cache: Dict[str, str] = {}
+        for entry in _iter_forecast_locations(payload):
+            found_agri = True
+            loc_name = entry.get("locationName")
+            loc_name = loc_cache.setdefault(loc_name, loc_name)
+            elements = entry.get("weatherElements", {})
+
+            min_series = _extract_temperature(elements.get("MinT"))
+            max_series = _extract_temperature(elements.get("MaxT"))
+            weather_series = _extract_temperature(elements.get("Wx"))
+
+            # 確保三個序列都存在
+            if not (min_series and max_series and weather_series):
+                print(f"⚠️ 跳過 {loc_name}: 資料不完整")
+                continue
+
+            # zip 自動取最短長度；一條 generator 建完整批 rows，
+            # 免去逐 index 取值與迴圈內的重複屬性查找
+            # 溫度換成十分之一度整數存入 weather_raw；
+            # 轉換失敗的值存 None，不讓單筆壞資料中斷整批
+            rows.extend(
+                (
+                    loc_name,
+                    date_str,
+                    _temp_to_tenths(mn.get("temperature")),
+                    _temp_to_tenths(mx.get("temperature")),
+                    wx.get("weather"),
+                )
+                for mn, mx, wx in zip(min_series, max_series, weather_series)
+                # daily 是原始 list，先排除異常項目；
+                # 沒日期的項目也跳過：forecast_date 是 NOT NULL 主鍵，
+                # 塞 None 會讓整批 executemany 被 rollback
+                if isinstance(mn, dict) and isinstance(mx, dict) and isinstance(wx, dict)
+                and (date_str := mn.get("dataDate") or mx.get("dataDate"))
+            )
+
+        if not found_agri:
             # Fallback 到潮汐模式
             print("⚠️ 未偵測到農業氣象資料，改用潮汐結構...")
             for entry in _iter_tide_locations(payload):
@@ -206,16 +261,28 @@ def fetch_and_save():
                 date_str = start_time[:10] if len(start_time) >= 10 else start_time or "未知日期"
                 description = start_time or "潮汐預報"
 
-                cursor.execute(
+                rows.append((loc_name, date_str, 0, 0, description))
+
+        # 一次交易 + executemany：整批只付一次 fsync 與一次 SQL 編譯成本
+        insert_count = 0
+        if rows:
+            try:
+                conn.execute("BEGIN")
+                # 清空與寫入放同一筆交易：失敗 rollback 會保留舊資料
+                cursor.execute("DELETE FROM weather_raw")
+                # OR REPLACE：同一 (location, forecast_date) 重複出現時保留最後一筆
+                cursor.executemany(
                     """
-                    INSERT INTO weather (location, forecast_date, min_temp, max_temp, description)
+                    INSERT OR REPLACE INTO weather_raw (location, forecast_date, min_temp_dc, max_temp_dc, description)
                     VALUES (?, ?, ?, ?, ?)
                     """,
-                    (loc_name, date_str, 0.0, 0.0, description),
+                    rows,
                 )
-                insert_count += 1
-
-        conn.commit()
+                conn.commit()
+                insert_count = len(rows)
+            except Exception as exc:
+                print(f"⚠️ 批次寫入失敗：{exc}")
+                conn.rollback()
 
     if insert_count:
         print(f"🎉 成功寫入 {insert_count} 筆詳細資料！")
@@ -224,5 +291,8 @@ def fetch_and_save():
         print("⚠️ 寫入 0 筆資料。請確認來源 JSON 格式是否正確。")
 
 if __name__ == "__main__":
-    init_db()
+    import sys
+
+    # --fast-refresh：只 DELETE 不 DROP，適合 Schema 沒變時的例行更新
+    init_db(fast_refresh="--fast-refresh" in sys.argv)
     fetch_and_save()
\ No newline at end of file
@@ -1,7 +1,6 @@
-import os
+import importlib.util
 import sqlite3
-import subprocess
-import sys
+import time
 from pathlib import Path
 
 import pandas as pd
@@ -30,163 +29,212 @@ st.markdown("資料來源：**CWA F-A0010-001** | 資料庫：**SQLite (data.db)
 ALL_OPTION = "全部地區"
 
 
+# 資料庫超過這個秒數沒更新就重新同步
+MAX_DB_AGE_SECONDS = 6 * 60 * 60
+
+
+@st.cache_resource(show_spinner=False)
+def _load_sync_module():
+    """以 importlib 載入 01_sync_data.py (檔名有數字開頭，無法直接 import)"""
+    spec = importlib.util.spec_from_file_location("sync_data", SYNC_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@st.cache_resource(show_spinner=False)
 def ensure_database() -> bool:
-    if DB_PATH.exists():
+    # mtime 檢查：DB 存在且夠新鮮就不重建，rerun 也不再碰檔案系統
+    if DB_PATH.exists() and time.time() - DB_PATH.stat().st_mtime < MAX_DB_AGE_SECONDS:
         return True
     if not SYNC_SCRIPT.exists():
         st.error("❌ 找不到 data.db，且缺少 01_sync_data.py。請確認專案檔案。")
         return False
-    with st.spinner("首次使用，正在建立資料庫..."):
+    with st.spinner("正在同步資料庫..."):
         try:
-            result = subprocess.run(
-                [sys.executable, str(SYNC_SCRIPT)],
-                check=True,
-                capture_output=True,
-                text=True,
-            )
-            if result.stdout:
-                st.caption(result.stdout)
-            if result.stderr:
-                st.caption(result.stderr)
-        except subprocess.CalledProcessError as exc:
+            # in-process 呼叫同步程式，省下 fork/exec 與直譯器啟動成本。
+            # DB 已存在就不先清空：fetch_and_save 會在同一筆交易內
+            # 先 DELETE 再寫入，下載失敗時保留舊資料
+            sync = _load_sync_module()
+            if not DB_PATH.exists():
+                sync.init_db()
+            sync.fetch_and_save()
+        except Exception as exc:
             st.error("自動同步資料失敗。請手動執行 01_sync_data.py。")
-            if exc.stdout:
-                st.error(exc.stdout)
-            if exc.stderr:
-                st.error(exc.stderr)
+            st.error(str(exc))
             return False
     return DB_PATH.exists()
 
 
 if not ensure_database():
+    # 失敗不能留在 process 共用的快取裡，清掉讓下次 rerun 重試
+    ensure_database.clear()
     st.stop()
 
-if not os.path.exists(DB_PATH):
-    st.error("❌ 找不到 data.db，請先執行 01_sync_data.py")
+@st.cache_data
+def load_df(mtime: float, location: str | None = None) -> pd.DataFrame:
+    """讀取 weather 表。以 DB mtime (+地區) 當快取 key，
+    日期解析與排序每次資料更新只做一次，widget 互動不重跑。
+    指定地區時用參數化 WHERE 只撈該地區，不整表載入再過濾。"""
+    query = (
+        "SELECT location, forecast_date, description, min_temp, max_temp"
+        " FROM weather"
+    )
+    params: tuple = ()
+    if location is not None:
+        query += " WHERE location = ?"
+        params = (location,)
+    # 只取會用到的欄位 (id 用不到)，排序交給 SQLite (有 ix_weather_date_loc 索引可用)
+    query += " ORDER BY forecast_date, location"
+    with sqlite3.connect(DB_PATH) as conn:
+        df = pd.read_sql_query(
+            query,
+            conn,
+            params=params,
+            parse_dates=["forecast_date"],
+        )
+    # float32 就夠顯示一位小數的溫度，後續聚合/繪圖少搬一半記憶體
+    return df.astype({"min_temp": "float32", "max_temp": "float32"})
+
+
+@st.cache_data
+def location_list(mtime: float) -> list:
+    """側邊欄選單用的地區清單，不需要整張表"""
+    with sqlite3.connect(DB_PATH) as conn:
+        return [
+            row[0]
+            for row in conn.execute("SELECT DISTINCT location FROM weather ORDER BY location")
+        ]
+
+
+@st.cache_data
+def overview_stats(mtime: float) -> tuple:
+    """全部地區的平均溫度與地區數，直接在 SQLite 算好"""
+    with sqlite3.connect(DB_PATH) as conn:
+        return conn.execute(
+            "SELECT AVG(min_temp), AVG(max_temp), COUNT(DISTINCT location) FROM weather"
+        ).fetchone()
+
+
+@st.cache_data
+def daily_means(mtime: float) -> pd.DataFrame:
+    """每日跨地區平均溫度，GROUP BY 交給 SQLite，結果直接餵給 line_chart"""
+    with sqlite3.connect(DB_PATH) as conn:
+        return pd.read_sql_query(
+            "SELECT forecast_date,"
+            " AVG(min_temp) AS 平均最低溫, AVG(max_temp) AS 平均最高溫"
+            " FROM weather GROUP BY forecast_date ORDER BY forecast_date",
+            conn,
+            parse_dates=["forecast_date"],
+            index_col="forecast_date",
+        )
+
+
+db_mtime = DB_PATH.stat().st_mtime
+locations = location_list(db_mtime)
+
+if not locations:
+    st.warning("⚠️ 資料表是空的，請檢查同步程式。")
 else:
-    conn = sqlite3.connect(DB_PATH)
-    # 關鍵修正：確保選取所有欄位，包含 forecast_date
-    df = pd.read_sql_query("SELECT * FROM weather", conn)
-    conn.close()
-    
-    if df.empty:
-        st.warning("⚠️ 資料表是空的，請檢查同步程式。")
+    # --- 1. 側邊欄篩選器 ---
+    with st.sidebar:
+        st.header("🔍 篩選條件")
+        options = [ALL_OPTION] + locations
+        selected_loc = st.selectbox("請選擇地區：", options)
+
+        st.info("💡 說明：\n此資料來自 CWA 農業氣象預報，包含未來一週的每日溫度預測。")
+
+    # 選「全部地區」才整表載入；單一地區交給 SQLite 用 WHERE 過濾
+    if selected_loc == ALL_OPTION:
+        filtered_df = load_df(db_mtime)
     else:
-        # --- 1. 側邊欄篩選器 ---
-        with st.sidebar:
-            st.header("🔍 篩選條件")
-            locations = df["location"].unique()
-            options = [ALL_OPTION] + sorted(locations.tolist())
-            selected_loc = st.selectbox("請選擇地區：", options)
-            
-            st.info("💡 說明：\n此資料來自 CWA 農業氣象預報，包含未來一週的每日溫度預測。")
-
-        # 篩選出資料；選擇「全部地區」時保留所有紀錄
-        if selected_loc == ALL_OPTION:
-            filtered_df = df.copy()
-        else:
-            filtered_df = df[df["location"] == selected_loc].copy()
-
-        parsed_dates = False
-        try:
-            filtered_df["forecast_date"] = pd.to_datetime(filtered_df["forecast_date"])
-            sort_cols = ["forecast_date", "location"] if selected_loc == ALL_OPTION else ["forecast_date"]
-            filtered_df = filtered_df.sort_values(sort_cols)
-            parsed_dates = True
-        except Exception:
-            sort_cols = ["forecast_date", "location"] if selected_loc == ALL_OPTION else ["forecast_date"]
-            filtered_df = filtered_df.sort_values(sort_cols)
-
-        # --- 2. 顯示概況 ---
-        if selected_loc == ALL_OPTION:
-            st.subheader("🌍 全部地區總覽")
-            avg_min = filtered_df["min_temp"].mean()
-            avg_max = filtered_df["max_temp"].mean()
-            unique_locations = filtered_df["location"].nunique()
-
-            col1, col2, col3 = st.columns(3)
-            col1.metric("平均最低溫", f"{avg_min:.1f} °C")
-            col2.metric("平均最高溫", f"{avg_max:.1f} °C")
-            col3.metric("地區數量", f"{unique_locations} 個")
-        else:
-            st.subheader(f"📍 {selected_loc} - 未來一週天氣概況")
-            avg_min = filtered_df["min_temp"].mean()
-            avg_max = filtered_df["max_temp"].mean()
-
-            col1, col2, col3 = st.columns(3)
-            col1.metric("平均最低溫", f"{avg_min:.1f} °C", delta="週平均")
-            col2.metric("平均最高溫", f"{avg_max:.1f} °C", delta_color="inverse")
-            col3.metric("資料筆數", f"{len(filtered_df)} 天份")
-
-        # --- 3. 氣溫趨勢圖 (Line Chart) ---
-        st.divider()
-        st.subheader("📈 氣溫走勢圖")
-
-        chart_data = None
-        if not filtered_df.empty and parsed_dates:
-            indexed = filtered_df.set_index("forecast_date")
-            if selected_loc == ALL_OPTION:
-                chart_data = (
-                    indexed.resample("D")[["min_temp", "max_temp"]]
-                    .mean()
-                    .rename(columns={"min_temp": "平均最低溫", "max_temp": "平均最高溫"})
-                )
-            else:
-                chart_data = indexed[["min_temp", "max_temp"]].rename(
-                    columns={"min_temp": "最低溫", "max_temp": "最高溫"}
-                )
-
-        if chart_data is not None and not chart_data.empty:
-            st.line_chart(
-                chart_data,
-                color=["#3498db", "#e74c3c"],
-                height=300,
-            )
-        else:
-            st.info("暫時無法繪製折線圖（日期格式可能有誤）。")
-
-        # --- 4. 詳細資料表格 ---
-        st.divider()
-        st.subheader("📋 詳細預報數據")
-
-        display_df = filtered_df.copy()
-        if parsed_dates:
-            display_df["forecast_date"] = display_df["forecast_date"].dt.strftime("%Y-%m-%d")
-
-        if selected_loc == ALL_OPTION:
-            display_df = display_df[["location", "forecast_date", "description", "min_temp", "max_temp"]]
-            display_df.columns = [
-                "地區 (Location)",
-                "日期 (Date)",
-                "天氣現象 (Description)",
-                "最低溫 (°C)",
-                "最高溫 (°C)",
-            ]
-        else:
-            display_df = display_df[["forecast_date", "description", "min_temp", "max_temp"]]
-            display_df.columns = [
-                "日期 (Date)",
-                "天氣現象 (Description)",
-                "最低溫 (°C)",
-                "最高溫 (°C)",
-            ]
-
-        st.dataframe(
-            display_df,
-            hide_index=True,
-            use_container_width=True,
-            column_config={
-                "最低溫 (°C)": st.column_config.ProgressColumn(
-                    "最低溫",
-                    format="%.1f°C",
-                    min_value=0,
-                    max_value=40,
-                ),
-                "最高溫 (°C)": st.column_config.ProgressColumn(
-                    "最高溫",
-                    format="%.1f°C",
-                    min_value=0,
-                    max_value=40,
-                ),
-            },
+        filtered_df = load_df(db_mtime, selected_loc)
+
+    parsed_dates = pd.api.types.is_datetime64_any_dtype(filtered_df["forecast_date"])
+
+    # --- 2. 顯示概況 ---
+    if selected_loc == ALL_OPTION:
+        st.subheader("🌍 全部地區總覽")
+        avg_min, avg_max, unique_locations = overview_stats(db_mtime)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("平均最低溫", f"{avg_min:.1f} °C")
+        col2.metric("平均最高溫", f"{avg_max:.1f} °C")
+        col3.metric("地區數量", f"{unique_locations} 個")
+    else:
+        st.subheader(f"📍 {selected_loc} - 未來一週天氣概況")
+        avg_min = filtered_df["min_temp"].mean()
+        avg_max = filtered_df["max_temp"].mean()
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("平均最低溫", f"{avg_min:.1f} °C", delta="週平均")
+        col2.metric("平均最高溫", f"{avg_max:.1f} °C", delta_color="inverse")
+        col3.metric("資料筆數", f"{len(filtered_df)} 天份")
+
+    # --- 3. 氣溫趨勢圖 (Line Chart) ---
+    st.divider()
+    st.subheader("📈 氣溫走勢圖")
+
+    chart_data = None
+    if selected_loc == ALL_OPTION:
+        # 每日平均已在 SQL 端 GROUP BY 完成
+        chart_data = daily_means(db_mtime)
+    elif not filtered_df.empty and parsed_dates:
+        chart_data = filtered_df.set_index("forecast_date")[["min_temp", "max_temp"]].rename(
+            columns={"min_temp": "最低溫", "max_temp": "最高溫"}
+        )
+
+    if chart_data is not None and not chart_data.empty:
+        st.line_chart(
+            chart_data,
+            color=["#3498db", "#e74c3c"],
+            height=300,
         )
+    else:
+        st.info("暫時無法繪製折線圖（日期格式可能有誤）。")
+
+    # --- 4. 詳細資料表格 ---
+    st.divider()
+    st.subheader("📋 詳細預報數據")
+
+    display_df = filtered_df.copy()
+    if parsed_dates:
+        display_df["forecast_date"] = display_df["forecast_date"].dt.strftime("%Y-%m-%d")
+
+    if selected_loc == ALL_OPTION:
+        display_df = display_df[["location", "forecast_date", "description", "min_temp", "max_temp"]]
+        display_df.columns = [
+            "地區 (Location)",
+            "日期 (Date)",
+            "天氣現象 (Description)",
+            "最低溫 (°C)",
+            "最高溫 (°C)",
+        ]
+    else:
+        display_df = display_df[["forecast_date", "description", "min_temp", "max_temp"]]
+        display_df.columns = [
+            "日期 (Date)",
+            "天氣現象 (Description)",
+            "最低溫 (°C)",
+            "最高溫 (°C)",
+        ]
+
+    st.dataframe(
+        display_df,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "最低溫 (°C)": st.column_config.ProgressColumn(
+                "最低溫",
+                format="%.1f°C",
+                min_value=0,
+                max_value=40,
+            ),
+            "最高溫 (°C)": st.column_config.ProgressColumn(
+                "最高溫",
+                format="%.1f°C",
+                min_value=0,
+                max_value=40,
+            ),
+        },
+    )
@@ -15,6 +15,12 @@ def update_database():
     
     # 連線到 SQLite (如果檔案不存在會自動建立)
     conn = sqlite3.connect(DB_NAME)
+    # 批次寫入用的 PRAGMA：WAL + 關閉同步，整批只 fsync 一次
+    conn.executescript(
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=OFF;"
+        "PRAGMA temp_store=MEMORY;"
+    )
     cursor = conn.cursor()
 
     # 建立 Table (如果不存在的話)
@@ -33,12 +39,15 @@ def update_database():
     # 清空舊資料 (因為我們要存最新的)
     cursor.execute('DELETE FROM forecast')
 
-    # 插入新資料
-    for item in data:
-        cursor.execute('''
-            INSERT INTO forecast (city, wx, pop, min_t, max_t, time_desc)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (item['city'], item['wx'], item['pop'], item['min_t'], item['max_t'], item['time_desc']))
+    # 插入新資料 (executemany 一次綁定整批，免去逐列 execute 的開銷)
+    rows = [
+        (item['city'], item['wx'], item['pop'], item['min_t'], item['max_t'], item['time_desc'])
+        for item in data
+    ]
+    cursor.executemany('''
+        INSERT INTO forecast (city, wx, pop, min_t, max_t, time_desc)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
 
     conn.commit()
     conn.close()
@@ -7,12 +7,9 @@ pip install pandas numpy scikit-learn matplotlib seaborn
 
 import pandas as pd
 import numpy as np
-from urllib.request import urlopen
-from io import StringIO
 
 # Modeling & preprocessing
 from sklearn.model_selection import cross_val_score, KFold
-from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.linear_model import LinearRegression, LassoCV
@@ -29,14 +26,7 @@ RANDOM_STATE = 42
 
 # 1. CRISP-DM: Data understanding & load
 url = "https://gist.githubusercontent.com/GaneshSparkz/b5662effbdae8746f7f7d8ed70c42b2d/raw/faf8b1a0d58e251f48a647d3881e7a960c3f0925/50_Startups.csv"
-# read directly from URL (pandas can do this)
-df = pd.read_csv(url)
 
-# quick look
-print("資料 shape:", df.shape)
-print(df.head())
-
-# 2. Data preprocessing (資料準備)
 # target
 target = "Profit"
 
@@ -44,44 +34,65 @@ target = "Profit"
 num_features = ["R&D Spend", "Administration", "Marketing Spend"]
 cat_features = ["State"]
 
-# If there are stray spaces in column names, strip them:
-df.columns = [c.strip() for c in df.columns]
+# read directly from URL (pandas can do this);
+# explicit usecols + dtype skips the two-pass type inference and
+# halves numeric memory (float32 is plenty for these magnitudes)
+df = pd.read_csv(
+    url,
+    usecols=num_features + cat_features + [target],
+    dtype={
+        "R&D Spend": "float32",
+        "Administration": "float32",
+        "Marketing Spend": "float32",
+        "Profit": "float32",
+        "State": "category",
+    },
+)
+
+# quick look
+print("資料 shape:", df.shape)
+print(df.head())
 
+# 2. Data preprocessing (資料準備)
 X = df[num_features + cat_features]
 y = df[target].values
 
 # Preprocessing pipeline: OneHot for state + StandardScaler for numeric
 preproc = ColumnTransformer(transformers=[
     ("num", StandardScaler(), num_features),
-    ("cat", OneHotEncoder(sparse=False, drop='first'), cat_features)  # drop first to avoid collinearity
+    # categories are already known from the category dtype — skip the fit-time unique scan;
+    # drop first to avoid collinearity
+    ("cat", OneHotEncoder(categories=[df["State"].cat.categories], sparse=False, drop='first'), cat_features)
 ])
 
-# helper: evaluate pipeline with given estimator
+# Fit the preprocessor ONCE and reuse X_pre everywhere:
+# the OneHot/Scaler pass is identical for every estimator below,
+# so there is no reason to re-run it per pipeline / per fit
+X_pre = preproc.fit_transform(X)  # numpy array
+
+# helper: evaluate estimator on the shared preprocessed matrix
 cv = KFold(n_splits=5, shuffle=True, random_state=RANDOM_STATE)
 rmse_scorer = make_scorer(lambda y_true, y_pred: mean_squared_error(y_true, y_pred, squared=False), greater_is_better=False)
 # note: make_scorer expects greater_is_better; we'll compute RMSE manually with cross_val_score using neg MSE for clarity below
 
-def cv_rmse(pipe, X, y):
+def cv_rmse(est, X, y):
     # return mean RMSE across folds
-    neg_mse = cross_val_score(pipe, X, y, scoring="neg_mean_squared_error", cv=cv)
+    neg_mse = cross_val_score(est, X, y, scoring="neg_mean_squared_error", cv=cv, n_jobs=-1)
     rmse = np.sqrt(-neg_mse)
     return rmse.mean(), rmse.std()
 
 # 3. Baseline: Linear Regression with all features
-pipe_baseline = Pipeline([
-    ("pre", preproc),
-    ("reg", LinearRegression())
-])
-baseline_mean_rmse, baseline_std = cv_rmse(pipe_baseline, X, y)
+reg_baseline = LinearRegression()
+baseline_mean_rmse, baseline_std = cv_rmse(reg_baseline, X_pre, y)
 print(f"Baseline LinearRegression RMSE: {baseline_mean_rmse:.2f} ± {baseline_std:.2f}")
 
 # Fit baseline to get coefficients (for plotting)
-pipe_baseline.fit(X, y)
+reg_baseline.fit(X_pre, y)
 # get feature names after preprocessing
-onehot = pipe_baseline.named_steps["pre"].named_transformers_["cat"]
+onehot = preproc.named_transformers_["cat"]
 cat_names = onehot.get_feature_names_out(cat_features).tolist()
 feature_names = num_features + cat_names
-coefs = pipe_baseline.named_steps["reg"].coef_
+coefs = reg_baseline.coef_
 coef_df = pd.DataFrame({"feature": feature_names, "coef": coefs})
 coef_df["abs_coef"] = coef_df["coef"].abs()
 coef_df = coef_df.sort_values("abs_coef", ascending=False)
@@ -89,30 +100,24 @@ print("\nBaseline coefficients:")
 print(coef_df)
 
 # 4. LassoCV (L1 selection)
-pipe_lasso = Pipeline([
-    ("pre", preproc),
-    ("lasso", LassoCV(cv=5, random_state=RANDOM_STATE, max_iter=5000))
-])
-lasso_mean_rmse, lasso_std = cv_rmse(pipe_lasso, X, y)
+reg_lasso = LassoCV(cv=5, random_state=RANDOM_STATE, max_iter=5000, n_jobs=-1)
+lasso_mean_rmse, lasso_std = cv_rmse(reg_lasso, X_pre, y)
 print(f"\nLassoCV RMSE: {lasso_mean_rmse:.2f} ± {lasso_std:.2f}")
 
-pipe_lasso.fit(X, y)
-lasso_coef = pipe_lasso.named_steps["lasso"].coef_
+reg_lasso.fit(X_pre, y)
+lasso_coef = reg_lasso.coef_
 lasso_df = pd.DataFrame({"feature": feature_names, "coef": lasso_coef})
 lasso_df["selected"] = lasso_df["coef"].abs() > 1e-6
 print("\nLasso selected features:")
 print(lasso_df.sort_values("coef", key=lambda s: s.abs(), ascending=False))
 
 # 5. Random Forest feature importance
-pipe_rf = Pipeline([
-    ("pre", preproc),
-    ("rf", RandomForestRegressor(n_estimators=200, random_state=RANDOM_STATE))
-])
-rf_mean_rmse, rf_std = cv_rmse(pipe_rf, X, y)
+reg_rf = RandomForestRegressor(n_estimators=200, random_state=RANDOM_STATE, n_jobs=-1)
+rf_mean_rmse, rf_std = cv_rmse(reg_rf, X_pre, y)
 print(f"\nRandomForest RMSE: {rf_mean_rmse:.2f} ± {rf_std:.2f}")
 
-pipe_rf.fit(X, y)
-rf_imp = pipe_rf.named_steps["rf"].feature_importances_
+reg_rf.fit(X_pre, y)
+rf_imp = reg_rf.feature_importances_
 rf_df = pd.DataFrame({"feature": feature_names, "importance": rf_imp})
 rf_df = rf_df.sort_values("importance", ascending=False)
 print("\nRandomForest importances:")
@@ -125,10 +130,9 @@ rf_topk = rf_df.head(k)["feature"].tolist()
 # 6. Forward Selection (SequentialFeatureSelector) — 前向選擇
 # We'll use a simple linear regressor as the estimator for selection
 est = LinearRegression()
-# sequential selector expects numeric matrix; we'll run selection after preprocessing - so we build a small helper
-X_pre = preproc.fit_transform(X)  # numpy array
+# sequential selector expects numeric matrix; X_pre is already computed above
 # feature names already in feature_names
-sfs_forward = SequentialFeatureSelector(est, n_features_to_select=3, direction="forward", cv=5)
+sfs_forward = SequentialFeatureSelector(est, n_features_to_select=3, direction="forward", cv=5, n_jobs=-1)
 sfs_forward.fit(X_pre, y)
 mask_forward = sfs_forward.get_support()
 selected_forward = [f for f, m in zip(feature_names, mask_forward) if m]
@@ -136,23 +140,10 @@ print("\nForward-selected features (n=3):", selected_forward)
 
 # Evaluate performance of model trained only on forward-selected features
 from sklearn.linear_model import Ridge
-# create pipeline that selects columns by mask in preprocessed array
+# numpy fancy indexing slices the columns once up front, so CV runs the
+# bare estimator with no per-fold transformer overhead
 def evaluate_on_mask(mask, estimator=LinearRegression()):
-    # build pipeline that uses preproc then a custom selector by index
-    from sklearn.base import TransformerMixin, BaseEstimator
-    class ColumnSelector(TransformerMixin, BaseEstimator):
-        def __init__(self, mask):
-            self.mask = np.array(mask)
-        def fit(self, X, y=None):
-            return self
-        def transform(self, X):
-            return X[:, self.mask]
-    pipe = Pipeline([
-        ("pre", preproc),
-        ("select", ColumnSelector(mask)),
-        ("reg", estimator)
-    ])
-    return cv_rmse(pipe, X, y)
+    return cv_rmse(estimator, X_pre[:, np.asarray(mask)], y)
 
 forward_mean_rmse, forward_std = evaluate_on_mask(mask_forward, LinearRegression())
 print(f"Forward-selection LinearRegression RMSE: {forward_mean_rmse:.2f} ± {forward_std:.2f}")
@@ -180,9 +171,10 @@ results = pd.DataFrame([
 print("\nSummary results:")
 print(results)
 
-# Plot 1: RMSE comparison
+# Plot 1: RMSE comparison (plain matplotlib; seaborn's barplot reshapes the
+# frame to long form just to draw five bars, and keeps theming anyway via sns.set)
 plt.figure(figsize=(8,5))
-sns.barplot(x="method", y="mean_rmse", data=results, palette="muted", yerr=results["std_rmse"])
+plt.bar(results["method"], results["mean_rmse"], yerr=results["std_rmse"], capsize=4)
 plt.ylabel("CV RMSE")
 plt.title("Method comparison (lower is better)")
 plt.xticks(rotation=30)